@@ -1,10 +1,16 @@
 from pydantic_settings import BaseSettings
 from typing import List, Optional, Union
+from functools import lru_cache
 import os
 import secrets
 import json
 from pathlib import Path
 
+@lru_cache(maxsize=1)
+def _parse_admin_emails(raw: str) -> frozenset:
+    """Parse the ADMIN_EMAILS env string into a lowercase frozenset once"""
+    return frozenset(email.strip().lower() for email in raw.split(",") if email.strip())
+
 class Settings(BaseSettings):
     """Professional configuration management"""
     
@@ -42,6 +48,10 @@ class Settings(BaseSettings):
     DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "30"))
     DATABASE_TIMEOUT: int = int(os.getenv("DATABASE_TIMEOUT", "30"))
     DATABASE_ECHO: bool = os.getenv("DATABASE_ECHO", "false").lower() == "true"
+    DATABASE_MMAP_SIZE: int = int(os.getenv("DATABASE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    
+    # Static Files (disable the in-process mount when Nginx serves /static)
+    SERVE_STATIC: bool = os.getenv("SERVE_STATIC", "true").lower() == "true"
     
     # Database Backup
     AUTO_BACKUP_ENABLED: bool = os.getenv("AUTO_BACKUP_ENABLED", "true").lower() == "true"
@@ -98,6 +108,7 @@ class Settings(BaseSettings):
     # Structured Logging
     ENABLE_STRUCTURED_LOGGING: bool = os.getenv("ENABLE_STRUCTURED_LOGGING", "true").lower() == "true"
     LOG_REQUEST_DETAILS: bool = os.getenv("LOG_REQUEST_DETAILS", "true").lower() == "true"
+    DEBUG_REQUEST_LOGGING: bool = os.getenv("DEBUG_REQUEST_LOGGING", "false").lower() == "true"
     
     # ===== EMAIL SERVICE SETTINGS =====
     DEFAULT_FROM_EMAIL: str = os.getenv("DEFAULT_FROM_EMAIL", "support@kanopus.org")
@@ -164,6 +175,11 @@ class Settings(BaseSettings):
     def admin_emails_list(self) -> List[str]:
         """Get list of admin emails"""
         return [email.strip() for email in self.ADMIN_EMAILS.split(",") if email.strip()]
+
+    @property
+    def admin_emails_set(self) -> frozenset:
+        """Admin emails as a lowercase frozenset for O(1) membership checks"""
+        return _parse_admin_emails(self.ADMIN_EMAILS or "")
     
     @property
     def allowed_origins_list(self) -> List[str]:
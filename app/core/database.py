@@ -20,7 +20,7 @@ class DatabaseConnectionPool:
     def __init__(self, database_path: str, pool_size: int = 20):
         self.database_path = database_path
         self.pool_size = pool_size
-        self.pool = queue.Queue(maxsize=pool_size)
+        self.pool = queue.LifoQueue(maxsize=pool_size)
         self.lock = threading.Lock()
         self.total_connections = 0
         
@@ -42,16 +42,17 @@ class DatabaseConnectionPool:
                 self.database_path,
                 timeout=settings.DATABASE_TIMEOUT,
                 check_same_thread=False,
-                isolation_level=None  # Autocommit mode
+                isolation_level=None,  # Autocommit mode
+                cached_statements=256  # Keep hot queries prepared across calls
             )
             conn.row_factory = sqlite3.Row
             
             # SQLite optimizations for enterprise usage
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("PRAGMA synchronous=NORMAL")
-            conn.execute("PRAGMA cache_size=10000")
+            conn.execute("PRAGMA cache_size=-64000")  # 64MB page cache
             conn.execute("PRAGMA temp_store=memory")
-            conn.execute("PRAGMA mmap_size=268435456")  # 256MB
+            conn.execute(f"PRAGMA mmap_size={settings.DATABASE_MMAP_SIZE}")
             conn.execute("PRAGMA foreign_keys=ON")
             
             return conn
@@ -74,8 +75,6 @@ class DatabaseConnectionPool:
                 if not conn:
                     raise Exception("Unable to create database connection")
             
-            # Test connection
-            conn.execute("SELECT 1")
             yield conn
             
         except Exception as e:
@@ -412,6 +411,43 @@ class DatabaseManager:
                     cursor.execute("ALTER TABLE user_api_keys ADD COLUMN deleted_at TIMESTAMP NULL")
                     logger.info("Added missing deleted_at column to user_api_keys table")
                 
+                # Daily API usage rollup table, maintained incrementally by
+                # the public API service so usage stats don't re-aggregate
+                # the raw api_usage_logs rows on every read
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'api_usage_daily'"
+                )
+                rollup_existed = cursor.fetchone() is not None
+
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS api_usage_daily (
+                        user_id INTEGER NOT NULL,
+                        date DATE NOT NULL,
+                        calls INTEGER DEFAULT 0,
+                        successful INTEGER DEFAULT 0,
+                        failed INTEGER DEFAULT 0,
+                        PRIMARY KEY (user_id, date),
+                        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+                    )
+                """)
+
+                if not rollup_existed:
+                    # One-time backfill: the service only maintains the rollup
+                    # going forward, so without this an upgraded deployment
+                    # would report zero historical usage despite the raw log
+                    # rows still being on disk
+                    cursor.execute("""
+                        INSERT INTO api_usage_daily (user_id, date, calls, successful, failed)
+                        SELECT user_id, DATE(created_at), COUNT(*),
+                               COALESCE(SUM(status_code = 200), 0),
+                               COALESCE(SUM(status_code >= 400), 0)
+                        FROM api_usage_logs
+                        WHERE user_id IS NOT NULL
+                        GROUP BY user_id, DATE(created_at)
+                    """)
+                    if cursor.rowcount > 0:
+                        logger.info(f"Backfilled api_usage_daily with {cursor.rowcount} rows from api_usage_logs")
+
                 # System settings table
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS system_settings (
@@ -433,6 +469,8 @@ class DatabaseManager:
                     "CREATE INDEX IF NOT EXISTS idx_users_api_key_hash ON users(api_key_hash)",
                     "CREATE INDEX IF NOT EXISTS idx_users_active ON users(is_active)",
                     "CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users(last_activity)",
+                    "CREATE INDEX IF NOT EXISTS idx_users_email_active ON users(email) WHERE is_active = 1",
+                    "CREATE INDEX IF NOT EXISTS idx_users_username_active ON users(username) WHERE is_active = 1",
                     
                     "CREATE INDEX IF NOT EXISTS idx_user_api_keys_user_id ON user_api_keys(user_id)",
                     "CREATE INDEX IF NOT EXISTS idx_user_api_keys_api_key_hash ON user_api_keys(api_key_hash)",
@@ -470,6 +508,14 @@ class DatabaseManager:
                     "CREATE INDEX IF NOT EXISTS idx_audit_created_at ON audit_logs(created_at)",
                     
                     "CREATE INDEX IF NOT EXISTS idx_system_settings_key ON system_settings(key)",
+
+                    # Composite indexes for the public API hot path: template
+                    # resolution by (user, template), keyed API key lookups,
+                    # per-user usage/stat scans bounded by time
+                    "CREATE INDEX IF NOT EXISTS idx_templates_user_template ON email_templates(user_id, template_id)",
+                    "CREATE INDEX IF NOT EXISTS idx_user_api_keys_user_hash_active ON user_api_keys(user_id, api_key_hash, is_active)",
+                    "CREATE INDEX IF NOT EXISTS idx_api_usage_user_created ON api_usage_logs(user_id, created_at)",
+                    "CREATE INDEX IF NOT EXISTS idx_email_logs_user_sent_status ON email_logs(user_id, sent_at, status)",
                     
                     # Indexes for email_bounces table
                     "CREATE INDEX IF NOT EXISTS idx_email_bounces_email ON email_bounces(email)",
@@ -604,6 +650,27 @@ class DatabaseManager:
                 if column_name not in template_columns:
                     cursor.execute(f"ALTER TABLE email_templates ADD COLUMN {column_name} {column_def}")
                     logger.info(f"Added missing column {column_name} to email_templates table")
+
+            # Expose the variables JSON as a generated column so it can be
+            # filtered with SQLite's json functions instead of being treated
+            # as an opaque text blob (SQLite stores JSON as TEXT, so a
+            # VIRTUAL generated column is the native way to compute into it).
+            # table_info omits generated columns, so the idempotence check
+            # must use table_xinfo or the ALTER re-runs on every startup.
+            cursor.execute("PRAGMA table_xinfo(email_templates)")
+            template_xcolumns = [column[1] for column in cursor.fetchall()]
+            if "variables_count" not in template_xcolumns:
+                try:
+                    cursor.execute("""
+                        ALTER TABLE email_templates ADD COLUMN variables_count INTEGER
+                        GENERATED ALWAYS AS (json_array_length(variables)) VIRTUAL
+                    """)
+                    logger.info("Added generated variables_count column to email_templates table")
+                except Exception as e:
+                    logger.warning(f"Failed to add generated variables_count column: {e}")
+            # No query filters on variables_count yet, so indexing it was
+            # pure write overhead; shed the index from existing databases
+            cursor.execute("DROP INDEX IF EXISTS idx_templates_variables_count")
             
             # Check api_usage_logs table and add missing columns
             cursor.execute("PRAGMA table_info(api_usage_logs)")
@@ -616,7 +683,9 @@ class DatabaseManager:
                 ("request_id", "VARCHAR(255)"),
                 ("client_ip", "VARCHAR(45)"),
                 ("status_code", "INTEGER"),
-                ("response_message", "TEXT")
+                ("response_message", "TEXT"),
+                ("request_hash", "CHAR(64)"),
+                ("request_size", "INTEGER")
             ]
             
             for column_name, column_def in missing_api_log_columns:
@@ -643,6 +712,8 @@ class DatabaseManager:
                                 ip_address VARCHAR(45),
                                 user_agent TEXT,
                                 request_data TEXT,
+                                request_hash CHAR(64),
+                                request_size INTEGER,
                                 response_status INTEGER,
                                 status_code INTEGER,
                                 response_time_ms INTEGER,
@@ -191,3 +191,22 @@ class AdminStats(BaseModel):
     total_templates: int
     system_templates: int
     active_users_today: int
+
+class BatchSubRequest(BaseModel):
+    id: str
+    method: str = "GET"
+    url: str
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+class BatchSubResponse(BaseModel):
+    id: str
+    status: int
+    headers: Dict[str, str]
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from app.models.schemas import UserCreate, UserLogin, User, Token, UserUpdate
 from app.services.user import user_service as user
@@ -27,7 +28,7 @@ async def register(user_data: UserCreate):
             )
         
         # Create user
-        created_user = user.create_user(user_data)
+        created_user = await run_in_threadpool(user.create_user, user_data)
         if not created_user:
             logger.warning(f"Registration failed - user already exists: username={user_data.username}, email={user_data.email}")
             raise HTTPException(
@@ -52,7 +53,7 @@ async def login(user_data: UserLogin):
     """Authenticate user and return JWT token"""
     try:
         # Authenticate user
-        authenticated_user = user.authenticate_user(user_data)
+        authenticated_user = await run_in_threadpool(user.authenticate_user, user_data)
         if not authenticated_user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -102,7 +103,7 @@ async def update_current_user(
                 )
         
         # Update user
-        success = user.update_user(current_user.id, user_data, current_user)
+        success = await run_in_threadpool(user.update_user, current_user.id, user_data, current_user)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -0,0 +1,87 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from app.models.schemas import BatchRequest, BatchSubRequest, BatchSubResponse, BatchResponse
+import asyncio
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+# Cap the fan-out so one envelope cannot monopolize the worker
+MAX_BATCH_SIZE = 20
+
+async def _dispatch(client: httpx.AsyncClient, sub: BatchSubRequest, auth_header: str) -> BatchSubResponse:
+    """Execute one sub-request in-process and capture its response"""
+    try:
+        headers = dict(sub.headers)
+        if auth_header and not any(key.lower() == "authorization" for key in headers):
+            # Sub-requests inherit the envelope's credentials unless they
+            # carry their own
+            headers["Authorization"] = auth_header
+
+        response = await client.request(
+            sub.method,
+            sub.url,
+            headers=headers,
+            json=sub.body if sub.body is not None else None
+        )
+
+        content_type = response.headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            body = response.json()
+        else:
+            body = response.text
+
+        return BatchSubResponse(
+            id=sub.id,
+            status=response.status_code,
+            headers={"content-type": content_type},
+            body=body
+        )
+
+    except Exception as e:
+        logger.error(f"Batch sub-request {sub.id} failed: {e}")
+        return BatchSubResponse(
+            id=sub.id,
+            status=status.HTTP_502_BAD_GATEWAY,
+            headers={},
+            body={"detail": "Sub-request failed"}
+        )
+
+@router.post("", response_model=BatchResponse)
+async def execute_batch(batch: BatchRequest, request: Request):
+    """Execute up to MAX_BATCH_SIZE API calls in one HTTP round-trip
+
+    Sub-requests are dispatched through the application in-process and run
+    concurrently, so a dashboard that needs N endpoints pays one network
+    round-trip instead of N.
+    """
+    if not batch.requests:
+        return BatchResponse(responses=[])
+
+    if len(batch.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch size exceeds the maximum of {MAX_BATCH_SIZE} requests"
+        )
+
+    for sub in batch.requests:
+        # Only the versioned API may be multiplexed, and never recursively
+        if not sub.url.startswith("/api/v1/") or sub.url.startswith("/api/v1/batch"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Sub-request {sub.id} targets an invalid URL"
+            )
+
+    auth_header = request.headers.get("authorization", "")
+
+    # ASGITransport routes the sub-requests straight into the app without
+    # touching the network stack
+    transport = httpx.ASGITransport(app=request.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+        responses = await asyncio.gather(
+            *(_dispatch(client, sub, auth_header) for sub in batch.requests)
+        )
+
+    return BatchResponse(responses=list(responses))
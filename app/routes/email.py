@@ -8,6 +8,7 @@ from app.services.email import email
 from app.services.template import template
 from app.services.limitter import rate_limit
 from app.core.deps import get_current_user, verify_api_access
+from app.core.config import settings
 import logging
 import asyncio
 
@@ -299,48 +300,49 @@ async def send_emails_api(
                 detail="SMTP configuration not found. Please configure SMTP settings first."
             )
         
-        # Send emails
-        results = []
-        successful_sends = 0
-        
-        for recipient in email_data.recipients:
-            # Check if we've hit the limit
-            if successful_sends >= remaining and remaining != -1:
-                break
-            
-            try:
-                # Use the enhanced email sending method
-                success, error_message, message_id = await email.send_email_enhanced(
-                    user_id=user.id,
-                    template_id=template_id,
-                    recipient_email=recipient,
-                    variables=email_data.variables,
-                    smtp_config=smtp_config
-                )
-                
-                if success:
-                    successful_sends += 1
-                    rate_limit.increment_email_count(user.id)
-                    status_msg = "sent"
-                else:
-                    status_msg = "failed"
-                
-                results.append({
-                    "recipient": recipient,
-                    "status": status_msg,
-                    "message_id": message_id if success else None,
-                    "error": error_message if not success else None
-                })
-                
-            except Exception as e:
-                logger.error(f"Error sending email to {recipient}: {e}")
-                
-                results.append({
-                    "recipient": recipient,
-                    "status": "failed",
-                    "message_id": None,
-                    "error": str(e)
-                })
+        # Send emails concurrently; the semaphore bounds the fan-out so one
+        # request cannot saturate the SMTP connection pool
+        recipients = list(email_data.recipients)
+        if remaining != -1:
+            # Never attempt more sends than the daily quota has left
+            recipients = recipients[:remaining]
+
+        semaphore = asyncio.Semaphore(settings.EMAIL_QUEUE_WORKERS)
+
+        async def send_one(recipient: str) -> dict:
+            async with semaphore:
+                try:
+                    # Use the enhanced email sending method
+                    success, error_message, message_id = await email.send_email_enhanced(
+                        user_id=user.id,
+                        template_id=template_id,
+                        recipient_email=recipient,
+                        variables=email_data.variables,
+                        smtp_config=smtp_config
+                    )
+
+                    if success:
+                        rate_limit.increment_email_count(user.id)
+
+                    return {
+                        "recipient": recipient,
+                        "status": "sent" if success else "failed",
+                        "message_id": message_id if success else None,
+                        "error": error_message if not success else None
+                    }
+
+                except Exception as e:
+                    logger.error(f"Error sending email to {recipient}: {e}")
+
+                    return {
+                        "recipient": recipient,
+                        "status": "failed",
+                        "message_id": None,
+                        "error": str(e)
+                    }
+
+        results = list(await asyncio.gather(*(send_one(recipient) for recipient in recipients)))
+        successful_sends = sum(1 for result in results if result["status"] == "sent")
         
         # Log API usage
         rate_limit.log_api_usage(
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from app.models.schemas import (
     EmailTemplate, EmailTemplateCreate, User
@@ -68,7 +69,7 @@ async def create_template(
             )
         
         # Create template
-        new_template = template.create_template(current_user.id, template_data)
+        new_template = await run_in_threadpool(template.create_template, current_user.id, template_data)
         if not new_template:
             logger.warning(f"Template ID {template_data.template_id} already exists for user {current_user.username}")
             raise HTTPException(
@@ -103,8 +104,8 @@ async def get_user_templates(
 ):
     """Get user's email templates"""
     try:
-        templates = template.get_user_templates(current_user.id, limit, offset)
-        return templates
+        payload = await run_in_threadpool(template.get_user_templates_json, current_user.id, limit, offset)
+        return Response(content=payload, media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error getting user templates: {e}")
@@ -121,8 +122,8 @@ async def get_public_templates(
 ):
     """Get public and system templates"""
     try:
-        templates = template.get_public_templates(limit, offset, category)
-        return templates
+        payload = await run_in_threadpool(template.get_public_templates_json, limit, offset, category)
+        return Response(content=payload, media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error getting public templates: {e}")
@@ -135,7 +136,7 @@ async def get_public_templates(
 async def get_template_categories():
     """Get all template categories"""
     try:
-        categories = template.get_template_categories()
+        categories = await run_in_threadpool(template.get_template_categories)
         return categories
         
     except Exception as e:
@@ -152,7 +153,7 @@ async def get_template(
 ):
     """Get specific template by ID"""
     try:
-        template_result = template.get_template_by_id(current_user.id, template_id)
+        template_result = await run_in_threadpool(template.get_template_by_id, current_user.id, template_id)
         if not template_result:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -178,7 +179,7 @@ async def update_template(
 ):
     """Update an existing template"""
     try:
-        success = template.update_template(current_user.id, template_id, template_data)
+        success = await run_in_threadpool(template.update_template, current_user.id, template_id, template_data)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -186,7 +187,7 @@ async def update_template(
             )
         
         # Return updated template
-        updated_template = template.get_template_by_id(current_user.id, template_id)
+        updated_template = await run_in_threadpool(template.get_template_by_id, current_user.id, template_id)
         logger.info(f"Template updated: {template_id} by user {current_user.username}")
         return updated_template
         
@@ -206,7 +207,7 @@ async def delete_template(
 ):
     """Delete a template"""
     try:
-        success = template.delete_template(current_user.id, template_id)
+        success = await run_in_threadpool(template.delete_template, current_user.id, template_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
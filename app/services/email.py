@@ -18,6 +18,7 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any, Tuple, Set
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
+from functools import lru_cache
 from threading import Lock
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -30,6 +31,21 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; matches {{variable_name}} placeholders in template content
+_VARIABLE_PATTERN = re.compile(r'\{\{([^}]+)\}\}')
+
+@lru_cache(maxsize=settings.TEMPLATE_CACHE_SIZE)
+def _render_content(content: str, variable_items: tuple) -> str:
+    """Substitute template variables into content, memoized per input pair
+
+    Bulk sends re-render the same template with the same variables once per
+    recipient; caching on the (content, variables) pair means the string
+    replacement work happens only once per distinct combination.
+    """
+    for key, value in variable_items:
+        content = content.replace(f"{{{{{key}}}}}", value)
+    return content
+
 @dataclass
 class ConnectionPoolEntry:
     """SMTP connection pool entry with metadata"""
@@ -346,22 +362,17 @@ class EmailService:
     @staticmethod
     def extract_variables(content: str) -> List[str]:
         """Extract template variables from content (e.g., {{variable_name}})"""
-        import re
         if not content:
             return []
-        
-        # Find all variables in {{variable_name}} format
-        pattern = r'\{\{([^}]+)\}\}'
-        matches = re.findall(pattern, content)
-        
-        # Clean up variable names (remove spaces, convert to lowercase if needed)
-        variables = []
-        for match in matches:
-            variable_name = match.strip()
-            if variable_name and variable_name not in variables:
-                variables.append(variable_name)
-        
-        return variables
+
+        # Dedupe while preserving first-seen order
+        seen = {}
+        for match in _VARIABLE_PATTERN.finditer(content):
+            variable_name = match.group(1).strip()
+            if variable_name:
+                seen[variable_name] = None
+
+        return list(seen)
     
     def _validate_smtp_config(self, config: SMTPConfigCreate) -> Tuple[bool, str]:
         """Validate SMTP configuration"""
@@ -624,12 +635,10 @@ class EmailService:
         """Replace template variables in content"""
         if not variables:
             return content
-        
+
         try:
-            for key, value in variables.items():
-                placeholder = f"{{{{{key}}}}}"
-                content = content.replace(placeholder, str(value))
-            return content
+            variable_items = tuple(sorted((key, str(value)) for key, value in variables.items()))
+            return _render_content(content, variable_items)
         except Exception as e:
             logger.warning(f"Variable replacement error: {e}")
             return content
@@ -8,8 +8,10 @@ import asyncio
 import logging
 from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta
-import json
+import orjson
 import hashlib
+import hmac
+import time
 import uuid
 from contextlib import asynccontextmanager
 
@@ -23,6 +25,32 @@ from app.services.template import TemplateService
 
 logger = logging.getLogger(__name__)
 
+# Negative cache of recently failed API key lookups. Under credential-stuffing
+# load the same bad keys are retried over and over; a membership test here
+# short-circuits those attempts before any SQL query is issued. Entries are
+# 8-byte sha256 prefixes of the username/key pair mapped to an expiry, so a
+# key that fails only because its account is currently suspended stops being
+# blacklisted within the TTL of the account coming back. The dict is bounded
+# so it cannot grow without limit.
+_BAD_KEY_CACHE_TTL = 60
+_BAD_KEY_CACHE_MAX_SIZE = 100000
+_bad_key_cache: Dict[bytes, float] = {}
+
+def _bad_key_digest(username: str, api_key_hash: str) -> bytes:
+    """Compute the negative-cache digest for a username/API-key-hash pair"""
+    return hashlib.sha256(f"{username}:{api_key_hash}".encode(), usedforsecurity=False).digest()[:8]
+
+def _is_bad_key(digest: bytes) -> bool:
+    """Check whether a lookup failed recently enough to still be cached"""
+    expiry = _bad_key_cache.get(digest)
+    return expiry is not None and expiry > time.monotonic()
+
+def _remember_bad_key(digest: bytes):
+    """Record a failed API key lookup in the negative cache"""
+    if len(_bad_key_cache) >= _BAD_KEY_CACHE_MAX_SIZE:
+        _bad_key_cache.clear()
+    _bad_key_cache[digest] = time.monotonic() + _BAD_KEY_CACHE_TTL
+
 class PublicAPIService:
     """Enterprise public API service for email sending"""
     
@@ -46,7 +74,7 @@ class PublicAPIService:
         Endpoint: /{username}/{template_id}
         """
         start_time = datetime.utcnow()
-        request_id = str(uuid.uuid4())
+        request_id = uuid.uuid4().hex
         
         try:
             logger.info(f"Public API request started: {request_id}", extra={
@@ -57,12 +85,32 @@ class PublicAPIService:
                 "user_agent": user_agent
             })
             
+            # Reject keys that failed validation recently before the wide
+            # send-context JOIN is issued - this check is what keeps
+            # credential-stuffing retries away from the expensive SQL
+            api_key_hash = hashlib.sha256(api_key.encode(), usedforsecurity=False).hexdigest()
+            bad_key_digest = _bad_key_digest(username, api_key_hash)
+            if _is_bad_key(bad_key_digest):
+                await self._log_api_usage(
+                    username, template_id, client_ip, user_agent,
+                    request_data, 401, "Invalid API key", request_id, now=start_time
+                )
+                return False, "Invalid API key", {"request_id": request_id}
+
+            # Steps 1/5/6 share one SQL round-trip: the user row, template
+            # row, and active SMTP config are fetched together instead of
+            # issuing three separate queries
+            context_row = await self._fetch_send_context(username, template_id)
+
             # Step 1: Validate API key and get user
-            user = await self._validate_api_key(api_key, username)
+            user = await self._validate_api_key(
+                api_key, username, now=start_time, user_row=context_row,
+                api_key_hash=api_key_hash
+            )
             if not user:
                 await self._log_api_usage(
                     username, template_id, client_ip, user_agent,
-                    request_data, 401, "Invalid API key", request_id
+                    request_data, 401, "Invalid API key", request_id, now=start_time
                 )
                 return False, "Invalid API key", {"request_id": request_id}
             
@@ -70,7 +118,7 @@ class PublicAPIService:
             if not user.is_active:
                 await self._log_api_usage(
                     username, template_id, client_ip, user_agent,
-                    request_data, 403, "Account suspended", request_id, user.id
+                    request_data, 403, "Account suspended", request_id, user.id, now=start_time
                 )
                 return False, "Account suspended", {"request_id": request_id}
             
@@ -79,7 +127,7 @@ class PublicAPIService:
             if not rate_limit_ok:
                 await self._log_api_usage(
                     username, template_id, client_ip, user_agent,
-                    request_data, 429, rate_limit_msg, request_id, user.id
+                    request_data, 429, rate_limit_msg, request_id, user.id, now=start_time
                 )
                 return False, rate_limit_msg, {"request_id": request_id}
             
@@ -88,25 +136,25 @@ class PublicAPIService:
             if not valid_request:
                 await self._log_api_usage(
                     username, template_id, client_ip, user_agent,
-                    request_data, 400, validation_error, request_id, user.id
+                    request_data, 400, validation_error, request_id, user.id, now=start_time
                 )
                 return False, validation_error, {"request_id": request_id}
             
             # Step 5: Get and validate template
-            template = await self._get_user_template(user.id, template_id)
+            template = self._template_from_context(context_row)
             if not template:
                 await self._log_api_usage(
                     username, template_id, client_ip, user_agent,
-                    request_data, 404, "Template not found", request_id, user.id
+                    request_data, 404, "Template not found", request_id, user.id, now=start_time
                 )
                 return False, "Template not found", {"request_id": request_id}
             
             # Step 6: Get user's SMTP configuration
-            smtp_config = await self._get_user_smtp_config(user.id)
+            smtp_config = self._smtp_config_from_context(context_row)
             if not smtp_config:
                 await self._log_api_usage(
                     username, template_id, client_ip, user_agent,
-                    request_data, 400, "SMTP not configured", request_id, user.id
+                    request_data, 400, "SMTP not configured", request_id, user.id, now=start_time
                 )
                 return False, "SMTP configuration required", {"request_id": request_id}
             
@@ -117,24 +165,32 @@ class PublicAPIService:
             
             if not recipients:
                 recipients = [request_data.get('to_email', request_data.get('email'))]
-            
-            if not recipients or not any(recipients):
+
+            # Drop empty entries and duplicates (order-preserving) up front so
+            # the send loop only sees addresses that will actually be sent to
+            recipients = list(dict.fromkeys(r for r in recipients if r))
+
+            if not recipients:
                 await self._log_api_usage(
                     username, template_id, client_ip, user_agent,
-                    request_data, 400, "No recipients specified", request_id, user.id
+                    request_data, 400, "No recipients specified", request_id, user.id, now=start_time
                 )
                 return False, "No recipients specified", {"request_id": request_id}
-            
+
+            if len(recipients) > 100:
+                await self._log_api_usage(
+                    username, template_id, client_ip, user_agent,
+                    request_data, 400, "Maximum 100 recipients per request", request_id, user.id, now=start_time
+                )
+                return False, "Maximum 100 recipients per request", {"request_id": request_id}
+
             # Step 8: Process and send emails
             variables = request_data.get('variables', {})
             sent_count = 0
             failed_count = 0
             results = []
-            
+
             for recipient in recipients:
-                if not recipient:
-                    continue
-                    
                 try:
                     # Send individual email
                     success, message, message_id = await self.email.send_email_enhanced(
@@ -179,11 +235,11 @@ class PublicAPIService:
             
             await self._log_api_usage(
                 username, template_id, client_ip, user_agent,
-                request_data, status_code, response_message, request_id, user.id
+                request_data, status_code, response_message, request_id, user.id, now=start_time
             )
             
             # Step 10: Update user statistics
-            await self._update_user_stats(user.id, sent_count, failed_count)
+            await self._update_user_stats(user.id, sent_count, failed_count, now=start_time)
             
             # Step 11: Return results
             end_time = datetime.utcnow()
@@ -222,49 +278,77 @@ class PublicAPIService:
             
             return False, "Internal server error", {"request_id": request_id}
     
-    async def _validate_api_key(self, api_key: str, username: str) -> Optional[User]:
-        """Validate API key and return user"""
+    async def _validate_api_key(
+        self,
+        api_key: str,
+        username: str,
+        now: Optional[datetime] = None,
+        user_row=None,
+        api_key_hash: Optional[str] = None
+    ) -> Optional[User]:
+        """Validate API key and return user
+
+        Accepts a pre-fetched user row (e.g. from _fetch_send_context) so the
+        hot send path does not re-query the users table, and the already
+        computed key hash so it is not digested twice per request.
+        """
         try:
+            # Reuse the caller's request timestamp when provided so we only
+            # take one utcnow() reading per request
+            now = now or datetime.utcnow()
+            # Hash the API key once up front; the digest is reused for both
+            # the negative cache and the user_api_keys lookup below
+            if api_key_hash is None:
+                api_key_hash = hashlib.sha256(api_key.encode(), usedforsecurity=False).hexdigest()
+
+            # Short-circuit keys that already failed validation recently
+            bad_key_digest = _bad_key_digest(username, api_key_hash)
+            if _is_bad_key(bad_key_digest):
+                return None
+
+            if user_row is None:
+                with db_manager.get_db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT * FROM users WHERE username = ? AND is_active = 1", (username,))
+                    user_row = cursor.fetchone()
+
+            if not user_row:
+                _remember_bad_key(bad_key_digest)
+                return None
+
+            # Check if it's the main user API key (stored in users table)
+            # using a constant-time comparison to prevent timing leaks
+            if hmac.compare_digest(user_row['api_key'], api_key):
+                return User(
+                    id=user_row['id'],
+                    username=user_row['username'],
+                    email=user_row['email'],
+                    is_verified=bool(user_row['is_verified']),
+                    is_admin=bool(user_row['is_admin']),
+                    is_active=bool(user_row['is_active']),
+                    api_key=api_key,
+                    created_at=user_row['created_at'],
+                    updated_at=user_row['updated_at']
+                )
+
+            # If not main API key, check user-generated API keys
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
-                
-                # First, try to find user by username
-                cursor.execute("SELECT * FROM users WHERE username = ? AND is_active = 1", (username,))
-                user_row = cursor.fetchone()
-                
-                if not user_row:
-                    return None
-                
-                # Check if it's the main user API key (stored in users table)
-                if user_row['api_key'] == api_key:
-                    return User(
-                        id=user_row['id'],
-                        username=user_row['username'],
-                        email=user_row['email'],
-                        is_verified=bool(user_row['is_verified']),
-                        is_admin=bool(user_row['is_admin']),
-                        is_active=bool(user_row['is_active']),
-                        api_key=api_key,
-                        created_at=user_row['created_at'],
-                        updated_at=user_row['updated_at']
-                    )
-                
-                # If not main API key, check user-generated API keys
-                hashed_key = hashlib.sha256(api_key.encode()).hexdigest()
-                
                 cursor.execute("""
                     SELECT ak.*, ak.is_active as key_active, ak.expires_at
                     FROM user_api_keys ak
                     WHERE ak.user_id = ? AND ak.api_key_hash = ? AND ak.is_active = 1
-                """, (user_row['id'], hashed_key))
+                """, (user_row['id'], api_key_hash))
                 
                 key_row = cursor.fetchone()
-                
+
                 if not key_row:
+                    _remember_bad_key(bad_key_digest)
                     return None
-                
+
                 # Check if key is expired
-                if key_row['expires_at'] and datetime.fromisoformat(key_row['expires_at']) < datetime.utcnow():
+                if key_row['expires_at'] and datetime.fromisoformat(key_row['expires_at']) < now:
+                    _remember_bad_key(bad_key_digest)
                     return None
                 
                 # Update last used timestamp
@@ -272,7 +356,7 @@ class PublicAPIService:
                     UPDATE user_api_keys 
                     SET last_used = ?, usage_count = usage_count + 1
                     WHERE id = ?
-                """, (datetime.utcnow(), key_row['id']))
+                """, (now, key_row['id']))
                 
                 return User(
                     id=user_row['id'],
@@ -290,6 +374,87 @@ class PublicAPIService:
             logger.error(f"API key validation error: {e}")
             return None
     
+    async def _fetch_send_context(self, username: str, template_id: str):
+        """Fetch user, template, and SMTP config in a single SQL round-trip
+
+        Joins the users row against the matching template (the user's own
+        template wins over public/system ones) and the newest active SMTP
+        config. Returns the combined row, or None when the user is unknown;
+        missing template/SMTP data is reported as NULL joined columns.
+        """
+        try:
+            with db_manager.get_db_connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute("""
+                    SELECT u.*,
+                           t.id AS t_id, t.user_id AS t_user_id, t.template_id AS t_template_id,
+                           t.name AS t_name, t.subject AS t_subject, t.html_content AS t_html_content,
+                           t.text_content AS t_text_content, t.variables AS t_variables,
+                           t.category AS t_category, t.description AS t_description,
+                           t.is_public AS t_is_public, t.is_system_template AS t_is_system_template,
+                           t.created_at AS t_created_at, t.updated_at AS t_updated_at,
+                           s.id AS s_id, s.smtp_host AS s_smtp_host, s.smtp_port AS s_smtp_port,
+                           s.smtp_username AS s_smtp_username, s.smtp_password AS s_smtp_password,
+                           s.use_tls AS s_use_tls, s.from_email AS s_from_email,
+                           s.from_name AS s_from_name, s.is_active AS s_is_active,
+                           s.created_at AS s_created_at
+                    FROM users u
+                    LEFT JOIN email_templates t ON t.template_id = ?
+                        AND (t.user_id = u.id OR t.is_public = 1 OR t.is_system_template = 1)
+                    LEFT JOIN smtp_configs s ON s.user_id = u.id AND s.is_active = 1
+                    WHERE u.username = ? AND u.is_active = 1
+                    ORDER BY (t.user_id = u.id) DESC, s.created_at DESC
+                    LIMIT 1
+                """, (template_id, username))
+
+                return cursor.fetchone()
+
+        except Exception as e:
+            logger.error(f"Send context fetch error: {e}")
+            return None
+
+    def _template_from_context(self, row) -> Optional[EmailTemplate]:
+        """Build an EmailTemplate from the joined send-context row"""
+        if row is None or row['t_id'] is None:
+            return None
+
+        return EmailTemplate(
+            id=row['t_id'],
+            user_id=row['t_user_id'],
+            template_id=row['t_template_id'],
+            name=row['t_name'],
+            subject=row['t_subject'],
+            html_content=row['t_html_content'],
+            text_content=row['t_text_content'],
+            variables=orjson.loads(row['t_variables']) if row['t_variables'] else [],
+            category=row['t_category'],
+            description=row['t_description'],
+            is_public=bool(row['t_is_public']),
+            is_system_template=bool(row['t_is_system_template']),
+            created_at=row['t_created_at'],
+            updated_at=row['t_updated_at']
+        )
+
+    def _smtp_config_from_context(self, row) -> Optional[SMTPConfig]:
+        """Build an SMTPConfig (with decrypted password) from the send-context row"""
+        if row is None or row['s_id'] is None:
+            return None
+
+        return SMTPConfig(
+            id=row['s_id'],
+            user_id=row['id'],
+            smtp_host=row['s_smtp_host'],
+            smtp_port=row['s_smtp_port'],
+            smtp_username=row['s_smtp_username'] or "",
+            smtp_password=self.email._decrypt_password(row['s_smtp_password']),
+            use_tls=bool(row['s_use_tls']),
+            from_email=row['s_from_email'],
+            from_name=row['s_from_name'] or "",
+            is_active=bool(row['s_is_active']),
+            created_at=row['s_created_at']
+        )
+
     async def _check_rate_limits(self, user: User, client_ip: str) -> Tuple[bool, str]:
         """Check various rate limits for the user"""
         try:
@@ -422,7 +587,7 @@ class PublicAPIService:
                     subject=row['subject'],
                     html_content=row['html_content'],
                     text_content=row['text_content'],
-                    variables=json.loads(row['variables']) if row['variables'] else [],
+                    variables=orjson.loads(row['variables']) if row['variables'] else [],
                     category=row['category'],
                     description=row['description'],
                     is_public=bool(row['is_public']),
@@ -478,43 +643,76 @@ class PublicAPIService:
         status_code: int,
         response_message: str,
         request_id: str,
-        user_id: int = None
+        user_id: int = None,
+        now: Optional[datetime] = None
     ):
         """Log API usage for monitoring and analytics"""
         try:
+            now = now or datetime.utcnow()
+            # Serialize once, then store only a content hash + size on the
+            # happy path. The full payload (up to 100 recipients plus
+            # variables) is only persisted for error responses or when debug
+            # request logging is explicitly enabled, which keeps per-request
+            # disk I/O small.
+            serialized_request = orjson.dumps(request_data)
+            request_hash = hashlib.sha256(serialized_request).hexdigest()
+            request_size = len(serialized_request)
+
+            if status_code >= 400 or settings.DEBUG_REQUEST_LOGGING:
+                stored_request_data = serialized_request.decode()
+            else:
+                stored_request_data = None
+
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
-                
+
                 # Get user ID if not provided
                 if not user_id:
                     cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
                     user_row = cursor.fetchone()
                     user_id = user_row['id'] if user_row else 0  # Use 0 for anonymous/invalid users
-                
+
                 # Ensure user_id is not None
                 if user_id is None:
                     user_id = 0
-                
+
                 # Log the API call
                 cursor.execute("""
-                    INSERT INTO api_usage_logs 
+                    INSERT INTO api_usage_logs
                     (user_id, username, template_id, endpoint, method, client_ip, user_agent,
-                     request_data, status_code, response_message, request_id, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     request_data, request_hash, request_size, status_code, response_message,
+                     request_id, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """, (
                     user_id, username, template_id, f"/{username}/{template_id}",
-                    "POST", client_ip, user_agent, json.dumps(request_data), status_code,
-                    response_message, request_id, datetime.utcnow()
+                    "POST", client_ip, user_agent, stored_request_data, request_hash,
+                    request_size, status_code, response_message, request_id, now
                 ))
-                
+
+                # Maintain the daily rollup so stats reads don't have to
+                # aggregate the raw log rows
+                cursor.execute("""
+                    INSERT INTO api_usage_daily (user_id, date, calls, successful, failed)
+                    VALUES (?, ?, 1, ?, ?)
+                    ON CONFLICT(user_id, date) DO UPDATE SET
+                        calls = calls + 1,
+                        successful = successful + excluded.successful,
+                        failed = failed + excluded.failed
+                """, (
+                    user_id, now.date().isoformat(),
+                    1 if status_code == 200 else 0,
+                    1 if status_code >= 400 else 0
+                ))
+
                 conn.commit()
             
         except Exception as e:
             logger.error(f"API usage logging error: {e}")
     
-    async def _update_user_stats(self, user_id: int, sent_count: int, failed_count: int):
+    async def _update_user_stats(self, user_id: int, sent_count: int, failed_count: int, now: Optional[datetime] = None):
         """Update user statistics"""
         try:
+            now = now or datetime.utcnow()
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
                 
@@ -527,8 +725,8 @@ class PublicAPIService:
                         updated_at = ?
                     WHERE id = ?
                 """, (
-                    sent_count, sent_count, datetime.utcnow(), 
-                    datetime.utcnow(), user_id
+                    sent_count, sent_count, now,
+                    now, user_id
                 ))
                 
                 conn.commit()
@@ -539,45 +737,44 @@ class PublicAPIService:
     async def get_api_usage_stats(self, user_id: int, days: int = 30) -> Dict[str, Any]:
         """Get API usage statistics for a user"""
         try:
-            since_date = datetime.utcnow() - timedelta(days=days)
-            
+            since_date = (datetime.utcnow() - timedelta(days=days)).date().isoformat()
+
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Get detailed stats
+
+                # Read from the pre-aggregated daily rollup instead of
+                # scanning and grouping the raw api_usage_logs rows
                 cursor.execute("""
-                    SELECT 
-                        COUNT(*) as total_calls,
-                        COUNT(CASE WHEN status_code = 200 THEN 1 END) as successful_calls,
-                        COUNT(CASE WHEN status_code >= 400 THEN 1 END) as failed_calls,
-                        COUNT(DISTINCT DATE(created_at)) as active_days,
-                        AVG(CASE WHEN status_code = 200 THEN 1.0 ELSE 0.0 END) as success_rate
-                    FROM api_usage_logs 
-                    WHERE user_id = ? AND created_at >= ?
+                    SELECT
+                        COALESCE(SUM(calls), 0) as total_calls,
+                        COALESCE(SUM(successful), 0) as successful_calls,
+                        COALESCE(SUM(failed), 0) as failed_calls,
+                        COUNT(*) as active_days
+                    FROM api_usage_daily
+                    WHERE user_id = ? AND date >= ?
                 """, (user_id, since_date))
-                
+
                 stats_row = cursor.fetchone()
-                
+
                 # Get usage by day
                 cursor.execute("""
-                    SELECT 
-                        DATE(created_at) as date,
-                        COUNT(*) as calls,
-                        COUNT(CASE WHEN status_code = 200 THEN 1 END) as successful
-                    FROM api_usage_logs 
-                    WHERE user_id = ? AND created_at >= ?
-                    GROUP BY DATE(created_at)
+                    SELECT date, calls, successful
+                    FROM api_usage_daily
+                    WHERE user_id = ? AND date >= ?
                     ORDER BY date DESC
                 """, (user_id, since_date))
-                
+
                 daily_usage = cursor.fetchall()
-            
+
+            total_calls = stats_row['total_calls'] or 0
+            successful_calls = stats_row['successful_calls'] or 0
+
             return {
-                "total_calls": stats_row['total_calls'] or 0,
-                "successful_calls": stats_row['successful_calls'] or 0,
+                "total_calls": total_calls,
+                "successful_calls": successful_calls,
                 "failed_calls": stats_row['failed_calls'] or 0,
                 "active_days": stats_row['active_days'] or 0,
-                "success_rate": float(stats_row['success_rate'] or 0),
+                "success_rate": successful_calls / total_calls if total_calls else 0.0,
                 "daily_usage": [
                     {
                         "date": row['date'],
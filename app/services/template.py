@@ -1,12 +1,246 @@
 from typing import Optional, List, Dict, Any
 from app.core.database import db_manager
+from app.core.config import settings
 from app.models.schemas import EmailTemplate, EmailTemplateCreate
 from app.services.email import EmailService
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 import logging
-import json
+import orjson
+import time
 
 logger = logging.getLogger(__name__)
 
+# In-process cache of compiled EmailTemplate objects keyed by
+# (user_id, template_id). Template rows change rarely compared to how often
+# they are read on the send path, so entries live for CACHE_TEMPLATES_TTL
+# seconds and the cache is dropped wholesale on any template write.
+_template_cache: Dict[tuple, tuple] = {}
+
+# Cached (categories, expires_at) for the DISTINCT category dropdown scan
+_categories_cache: Optional[tuple] = None
+
+def _invalidate_template_cache():
+    """Drop all cached templates after a template write"""
+    global _categories_cache
+    _template_cache.clear()
+    _categories_cache = None
+
+# Pulls all fourteen template fields from a row in one C-level call
+_TEMPLATE_ROW_GET = itemgetter(
+    'id', 'user_id', 'template_id', 'name', 'subject', 'html_content',
+    'text_content', 'variables', 'is_public', 'is_system_template',
+    'category', 'description', 'created_at', 'updated_at'
+)
+
+def _template_from_row(row) -> EmailTemplate:
+    """Map an email_templates row to an EmailTemplate model
+
+    Rows come straight from our own schema, so model_construct is used to
+    skip Pydantic field validation on this hot path.
+    """
+    (row_id, user_id, template_id, name, subject, html_content, text_content,
+     variables, is_public, is_system_template, category, description,
+     created_at, updated_at) = _TEMPLATE_ROW_GET(row)
+    return EmailTemplate.model_construct(
+        id=row_id,
+        user_id=user_id,
+        template_id=template_id,
+        name=name,
+        subject=subject,
+        html_content=html_content,
+        text_content=text_content,
+        variables=orjson.loads(variables) if variables else [],
+        is_public=bool(is_public),
+        is_system_template=bool(is_system_template),
+        category=category,
+        description=description,
+        # model_construct skips coercion, so parse the timestamps here or
+        # they serialize as the raw SQLite strings
+        created_at=datetime.fromisoformat(created_at),
+        updated_at=datetime.fromisoformat(updated_at)
+    )
+
+def _templates_from_rows(rows) -> List[EmailTemplate]:
+    """Map a batch of fetched rows in one pass"""
+    return [_template_from_row(row) for row in rows]
+
+def _collect_variables(*parts: Optional[str]) -> List[str]:
+    """Extract template variables from several content parts in one regex pass"""
+    return EmailService.extract_variables("\n".join(part for part in parts if part))
+
+# Single-column version probe used to revalidate cached compiled templates:
+# other uvicorn workers cannot reach this process's invalidation hook, so a
+# cache hit is only served after its updated_at matches the row's
+_SQL_TEMPLATE_VERSION = """
+    SELECT updated_at FROM email_templates
+    WHERE template_id = ? AND (user_id = ? OR is_public = 1 OR is_system_template = 1)
+"""
+
+# Explicit projection for template reads; keeps fetches aligned with the
+# EmailTemplate model instead of pulling whatever SELECT * drags in
+_TEMPLATE_COLUMNS = (
+    "id, user_id, template_id, name, subject, html_content, text_content, "
+    "variables, is_public, is_system_template, category, description, "
+    "created_at, updated_at"
+)
+
+# SQL fragment building one response-shaped JSON object per template row,
+# so list endpoints can return database-assembled JSON without constructing
+# a Python model per row
+_TEMPLATE_JSON_OBJECT = """json_object(
+    'id', id, 'user_id', user_id, 'template_id', template_id,
+    'name', name, 'subject', subject,
+    'html_content', html_content, 'text_content', text_content,
+    'variables', json(coalesce(variables, '[]')),
+    'is_public', iif(is_public, json('true'), json('false')),
+    'is_system_template', iif(is_system_template, json('true'), json('false')),
+    'category', category, 'description', description,
+    'created_at', strftime('%Y-%m-%dT%H:%M:%S', created_at),
+    'updated_at', strftime('%Y-%m-%dT%H:%M:%S', updated_at)
+)"""
+
+@lru_cache(maxsize=settings.TEMPLATE_CACHE_SIZE)
+def _variables_json(*parts: Optional[str]) -> str:
+    """Serialized variable list for the given content parts, memoized
+
+    Template updates commonly resubmit unchanged content; caching on the
+    parts skips both the regex pass and the JSON dump in that case.
+    """
+    return orjson.dumps(_collect_variables(*parts)).decode()
+
+# Default system templates, with their variable lists and insert rows
+# precomputed at import so first-boot seeding is a single executemany
+_SYSTEM_TEMPLATES = [
+    {
+        'template_id': 'welcome-email',
+        'name': 'Welcome Email',
+        'subject': 'Welcome to {{company_name}}!',
+        'html_content': '''
+        <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #2c3e50;">Welcome to {{company_name}}!</h1>
+                <p>Hi {{first_name}},</p>
+                <p>Thank you for joining {{company_name}}. We're excited to have you on board!</p>
+                <p>Here are your next steps:</p>
+                <ul>
+                    <li>Complete your profile</li>
+                    <li>Explore our features</li>
+                    <li>Contact support if you need help</li>
+                </ul>
+                <p>Best regards,<br>The {{company_name}} Team</p>
+            </div>
+        </body>
+        </html>
+        ''',
+        'text_content': '''Welcome to {{company_name}}!
+
+Hi {{first_name}},
+
+Thank you for joining {{company_name}}. We're excited to have you on board!
+
+Here are your next steps:
+- Complete your profile
+- Explore our features
+- Contact support if you need help
+
+Best regards,
+The {{company_name}} Team''',
+        'category': 'Onboarding',
+        'description': 'Welcome email for new users'
+    },
+    {
+        'template_id': 'password-reset',
+        'name': 'Password Reset',
+        'subject': 'Reset Your Password - {{company_name}}',
+        'html_content': '''
+        <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #e74c3c;">Password Reset Request</h1>
+                <p>Hi {{first_name}},</p>
+                <p>You requested to reset your password for your {{company_name}} account.</p>
+                <p style="margin: 30px 0;">
+                    <a href="{{reset_link}}" style="background-color: #3498db; color: white; padding: 12px 25px; text-decoration: none; border-radius: 5px; display: inline-block;">Reset Password</a>
+                </p>
+                <p>This link will expire in 24 hours. If you didn't request this, please ignore this email.</p>
+                <p>Best regards,<br>The {{company_name}} Team</p>
+            </div>
+        </body>
+        </html>
+        ''',
+        'text_content': '''Password Reset Request
+
+Hi {{first_name}},
+
+You requested to reset your password for your {{company_name}} account.
+
+Reset your password: {{reset_link}}
+
+This link will expire in 24 hours. If you didn't request this, please ignore this email.
+
+Best regards,
+The {{company_name}} Team''',
+        'category': 'Authentication',
+        'description': 'Password reset email template'
+    },
+    {
+        'template_id': 'invoice-notification',
+        'name': 'Invoice Notification',
+        'subject': 'Invoice #{{invoice_number}} from {{company_name}}',
+        'html_content': '''
+        <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h1 style="color: #27ae60;">Invoice #{{invoice_number}}</h1>
+                <p>Hi {{customer_name}},</p>
+                <p>Thank you for your business! Your invoice is ready.</p>
+                <div style="background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0;">
+                    <p><strong>Invoice Number:</strong> {{invoice_number}}</p>
+                    <p><strong>Amount:</strong> {{amount}}</p>
+                    <p><strong>Due Date:</strong> {{due_date}}</p>
+                </div>
+                <p style="margin: 30px 0;">
+                    <a href="{{invoice_link}}" style="background-color: #27ae60; color: white; padding: 12px 25px; text-decoration: none; border-radius: 5px; display: inline-block;">View Invoice</a>
+                </p>
+                <p>Best regards,<br>The {{company_name}} Team</p>
+            </div>
+        </body>
+        </html>
+        ''',
+        'text_content': '''Invoice #{{invoice_number}}
+
+Hi {{customer_name}},
+
+Thank you for your business! Your invoice is ready.
+
+Invoice Number: {{invoice_number}}
+Amount: {{amount}}
+Due Date: {{due_date}}
+
+View your invoice: {{invoice_link}}
+
+Best regards,
+The {{company_name}} Team''',
+        'category': 'Business',
+        'description': 'Invoice notification email template'
+    }
+]
+
+_SYSTEM_TEMPLATE_ROWS = tuple(
+    (
+        template['template_id'], template['name'], template['subject'],
+        template['html_content'], template['text_content'],
+        orjson.dumps(_collect_variables(
+            template['html_content'], template['text_content'], template['subject']
+        )).decode(),
+        template['category'], template['description'], True
+    )
+    for template in _SYSTEM_TEMPLATES
+)
+
 class TemplateService:
     @staticmethod
     def create_template(user_id: int, template_data: EmailTemplateCreate) -> Optional[EmailTemplate]:
@@ -14,61 +248,41 @@ class TemplateService:
         try:
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Check if template_id already exists for this user
-                cursor.execute(
-                    "SELECT id FROM email_templates WHERE template_id = ? AND user_id = ?",
-                    (template_data.template_id, user_id)
-                )
-                if cursor.fetchone():
-                    return None
-                
+
                 # Extract variables from content
-                auto_variables = EmailService.extract_variables(template_data.html_content)
-                if template_data.text_content:
-                    auto_variables.extend(EmailService.extract_variables(template_data.text_content))
-                auto_variables.extend(EmailService.extract_variables(template_data.subject))
-                
+                auto_variables = _collect_variables(
+                    template_data.html_content, template_data.text_content,
+                    template_data.subject
+                )
+
                 # Combine auto-extracted variables with user-specified variables
                 user_variables = template_data.variables or []
                 all_variables = list(set(auto_variables + user_variables))
                 variables = all_variables
                 
-                # Insert template
+                # Insert template and read the created row back in the same statement;
+                # the UNIQUE(user_id, template_id, version) constraint rejects
+                # duplicates without a separate existence check
                 cursor.execute("""
-                    INSERT INTO email_templates 
-                    (user_id, template_id, name, subject, html_content, text_content, 
+                    INSERT OR IGNORE INTO email_templates
+                    (user_id, template_id, name, subject, html_content, text_content,
                      variables, category, description)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    RETURNING *
                 """, (
                     user_id, template_data.template_id, template_data.name,
                     template_data.subject, template_data.html_content, template_data.text_content,
-                    json.dumps(variables), template_data.category, template_data.description
+                    orjson.dumps(variables).decode(), template_data.category, template_data.description
                 ))
-                
-                template_id = cursor.lastrowid
-                conn.commit()
-                
-                # Fetch created template
-                cursor.execute("SELECT * FROM email_templates WHERE id = ?", (template_id,))
+
                 template_row = cursor.fetchone()
-                
-                return EmailTemplate(
-                    id=template_row['id'],
-                    user_id=template_row['user_id'],
-                    template_id=template_row['template_id'],
-                    name=template_row['name'],
-                    subject=template_row['subject'],
-                    html_content=template_row['html_content'],
-                    text_content=template_row['text_content'],
-                    variables=json.loads(template_row['variables']) if template_row['variables'] else [],
-                    is_public=bool(template_row['is_public']),
-                    is_system_template=bool(template_row['is_system_template']),
-                    category=template_row['category'],
-                    description=template_row['description'],
-                    created_at=template_row['created_at'],
-                    updated_at=template_row['updated_at']
-                )
+                conn.commit()
+                if template_row is None:
+                    # Template already exists for this user
+                    return None
+
+                _invalidate_template_cache()
+                return _template_from_row(template_row)
                 
         except Exception as e:
             logger.error(f"Error creating template: {e}")
@@ -81,73 +295,115 @@ class TemplateService:
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute("""
-                    SELECT * FROM email_templates 
-                    WHERE user_id = ? 
-                    ORDER BY created_at DESC 
+                cursor.execute(f"""
+                    SELECT {_TEMPLATE_COLUMNS} FROM email_templates
+                    WHERE user_id = ?
+                    ORDER BY created_at DESC
                     LIMIT ? OFFSET ?
                 """, (user_id, limit, offset))
                 
                 template_rows = cursor.fetchall()
                 
-                return [
-                    EmailTemplate(
-                        id=row['id'],
-                        user_id=row['user_id'],
-                        template_id=row['template_id'],
-                        name=row['name'],
-                        subject=row['subject'],
-                        html_content=row['html_content'],
-                        text_content=row['text_content'],
-                        variables=json.loads(row['variables']) if row['variables'] else [],
-                        is_public=bool(row['is_public']),
-                        is_system_template=bool(row['is_system_template']),
-                        category=row['category'],
-                        description=row['description'],
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at']
-                    )
-                    for row in template_rows
-                ]
+                return _templates_from_rows(template_rows)
             
         except Exception as e:
             logger.error(f"Error getting user templates: {e}")
             return []
-    
+
+    @staticmethod
+    def get_user_templates_json(user_id: int, limit: int = 100, offset: int = 0) -> str:
+        """Get templates for user as a ready-to-send JSON array string"""
+        try:
+            with db_manager.get_db_connection() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute(f"""
+                    SELECT json_group_array({_TEMPLATE_JSON_OBJECT}) AS payload FROM (
+                        SELECT {_TEMPLATE_COLUMNS} FROM email_templates
+                        WHERE user_id = ?
+                        ORDER BY created_at DESC
+                        LIMIT ? OFFSET ?
+                    )
+                """, (user_id, limit, offset))
+
+                return cursor.fetchone()['payload']
+
+        except Exception as e:
+            logger.error(f"Error getting user templates: {e}")
+            return "[]"
+
+    @staticmethod
+    def get_public_templates_json(limit: int = 100, offset: int = 0, category: Optional[str] = None) -> str:
+        """Get public and system templates as a ready-to-send JSON array string"""
+        try:
+            with db_manager.get_db_connection() as conn:
+                cursor = conn.cursor()
+
+                query = f"""
+                    SELECT {_TEMPLATE_COLUMNS} FROM email_templates
+                    WHERE (is_public = ? OR is_system_template = ?)
+                """
+                params = [True, True]
+
+                if category:
+                    query += " AND category = ?"
+                    params.append(category)
+
+                query += " ORDER BY is_system_template DESC, created_at DESC LIMIT ? OFFSET ?"
+                params.extend([limit, offset])
+
+                cursor.execute(
+                    f"SELECT json_group_array({_TEMPLATE_JSON_OBJECT}) AS payload FROM ({query})",
+                    params
+                )
+
+                return cursor.fetchone()['payload']
+
+        except Exception as e:
+            logger.error(f"Error getting public templates: {e}")
+            return "[]"
+
     @staticmethod
     def get_template_by_id(user_id: int, template_id: str) -> Optional[EmailTemplate]:
         """Get template by template_id for user"""
         try:
+            cache_key = (user_id, template_id)
+            cached = _template_cache.get(cache_key)
+
             with db_manager.get_db_connection() as conn:
+                if cached and cached[2] > time.monotonic():
+                    # Revalidate across workers: serve the cached compile
+                    # only while the row's updated_at is unchanged, so an
+                    # edit handled by another process is visible immediately
+                    version_row = conn.execute(
+                        _SQL_TEMPLATE_VERSION, (template_id, user_id)
+                    ).fetchone()
+                    if version_row and version_row[0] == cached[1]:
+                        return cached[0]
+
                 cursor = conn.cursor()
                 
-                cursor.execute("""
-                    SELECT * FROM email_templates 
+                cursor.execute(f"""
+                    SELECT {_TEMPLATE_COLUMNS} FROM email_templates
                     WHERE template_id = ? AND (user_id = ? OR is_public = ? OR is_system_template = ?)
                 """, (template_id, user_id, True, True))
                 
                 template_row = cursor.fetchone()
-                
+
                 if not template_row:
                     return None
-                
-                return EmailTemplate(
-                    id=template_row['id'],
-                    user_id=template_row['user_id'],
-                    template_id=template_row['template_id'],
-                    name=template_row['name'],
-                    subject=template_row['subject'],
-                    html_content=template_row['html_content'],
-                    text_content=template_row['text_content'],
-                    variables=json.loads(template_row['variables']) if template_row['variables'] else [],
-                    is_public=bool(template_row['is_public']),
-                    is_system_template=bool(template_row['is_system_template']),
-                    category=template_row['category'],
-                    description=template_row['description'],
-                    created_at=template_row['created_at'],
-                    updated_at=template_row['updated_at']
+
+                result = _template_from_row(template_row)
+
+                if len(_template_cache) >= settings.TEMPLATE_CACHE_SIZE:
+                    _template_cache.clear()
+                _template_cache[cache_key] = (
+                    result, template_row['updated_at'],
+                    time.monotonic() + settings.CACHE_TEMPLATES_TTL
                 )
-                
+
+                return result
+
         except Exception as e:
             logger.error(f"Error getting template: {e}")
             return None
@@ -159,8 +415,8 @@ class TemplateService:
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
                 
-                query = """
-                    SELECT * FROM email_templates 
+                query = f"""
+                    SELECT {_TEMPLATE_COLUMNS} FROM email_templates
                     WHERE (is_public = ? OR is_system_template = ?)
                 """
                 params = [True, True]
@@ -175,25 +431,7 @@ class TemplateService:
                 cursor.execute(query, params)
                 template_rows = cursor.fetchall()
                 
-                return [
-                    EmailTemplate(
-                        id=row['id'],
-                        user_id=row['user_id'],
-                        template_id=row['template_id'],
-                        name=row['name'],
-                        subject=row['subject'],
-                        html_content=row['html_content'],
-                        text_content=row['text_content'],
-                        variables=json.loads(row['variables']) if row['variables'] else [],
-                        is_public=bool(row['is_public']),
-                        is_system_template=bool(row['is_system_template']),
-                        category=row['category'],
-                        description=row['description'],
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at']
-                    )
-                    for row in template_rows
-                ]
+                return _templates_from_rows(template_rows)
                 
         except Exception as e:
             logger.error(f"Error getting public templates: {e}")
@@ -205,36 +443,30 @@ class TemplateService:
         try:
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
-                
-                # Check if template exists and belongs to user
-                cursor.execute(
-                    "SELECT id FROM email_templates WHERE template_id = ? AND user_id = ?",
-                    (template_id, user_id)
+
+                # Extract and serialize variables (memoized on the content)
+                variables_json = _variables_json(
+                    template_data.html_content, template_data.text_content,
+                    template_data.subject
                 )
-                if not cursor.fetchone():
-                    return False
-                
-                # Extract variables
-                variables = EmailService.extract_variables(template_data.html_content)
-                if template_data.text_content:
-                    variables.extend(EmailService.extract_variables(template_data.text_content))
-                variables.extend(EmailService.extract_variables(template_data.subject))
-                variables = list(set(variables))
-                
+
                 # Update template
                 cursor.execute("""
-                    UPDATE email_templates 
-                    SET name = ?, subject = ?, html_content = ?, text_content = ?, 
+                    UPDATE email_templates
+                    SET name = ?, subject = ?, html_content = ?, text_content = ?,
                         variables = ?, category = ?, description = ?, updated_at = CURRENT_TIMESTAMP
                     WHERE template_id = ? AND user_id = ?
                 """, (
                     template_data.name, template_data.subject, template_data.html_content,
-                    template_data.text_content, json.dumps(variables), template_data.category,
+                    template_data.text_content, variables_json, template_data.category,
                     template_data.description, template_id, user_id
                 ))
-                
+
+                updated = cursor.rowcount > 0
                 conn.commit()
-                return True
+                if updated:
+                    _invalidate_template_cache()
+                return updated
                 
         except Exception as e:
             logger.error(f"Error updating template: {e}")
@@ -254,6 +486,8 @@ class TemplateService:
                 
                 deleted = cursor.rowcount > 0
                 conn.commit()
+                if deleted:
+                    _invalidate_template_cache()
                 return deleted
                 
         except Exception as e:
@@ -263,19 +497,26 @@ class TemplateService:
     @staticmethod
     def get_template_categories() -> List[str]:
         """Get all template categories"""
+        global _categories_cache
         try:
+            cached = _categories_cache
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
-                
+
                 cursor.execute("""
-                    SELECT DISTINCT category FROM email_templates 
+                    SELECT DISTINCT category FROM email_templates
                     WHERE category IS NOT NULL AND category != ''
                     ORDER BY category
                 """)
-                
+
                 categories = [row['category'] for row in cursor.fetchall()]
-                return categories
-                
+
+            _categories_cache = (categories, time.monotonic() + settings.CACHE_TEMPLATES_TTL)
+            return categories
+
         except Exception as e:
             logger.error(f"Error getting categories: {e}")
             return []
@@ -291,143 +532,18 @@ class TemplateService:
                 cursor.execute("SELECT COUNT(*) as count FROM email_templates WHERE is_system_template = ?", (True,))
                 if cursor.fetchone()['count'] > 0:
                     return
-            
-            system_templates = [
-                {
-                    'template_id': 'welcome-email',
-                    'name': 'Welcome Email',
-                    'subject': 'Welcome to {{company_name}}!',
-                    'html_content': '''
-                    <html>
-                    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                            <h1 style="color: #2c3e50;">Welcome to {{company_name}}!</h1>
-                            <p>Hi {{first_name}},</p>
-                            <p>Thank you for joining {{company_name}}. We're excited to have you on board!</p>
-                            <p>Here are your next steps:</p>
-                            <ul>
-                                <li>Complete your profile</li>
-                                <li>Explore our features</li>
-                                <li>Contact support if you need help</li>
-                            </ul>
-                            <p>Best regards,<br>The {{company_name}} Team</p>
-                        </div>
-                    </body>
-                    </html>
-                    ''',
-                    'text_content': '''Welcome to {{company_name}}!
 
-Hi {{first_name}},
-
-Thank you for joining {{company_name}}. We're excited to have you on board!
-
-Here are your next steps:
-- Complete your profile
-- Explore our features
-- Contact support if you need help
-
-Best regards,
-The {{company_name}} Team''',
-                    'category': 'Onboarding',
-                    'description': 'Welcome email for new users'
-                },
-                {
-                    'template_id': 'password-reset',
-                    'name': 'Password Reset',
-                    'subject': 'Reset Your Password - {{company_name}}',
-                    'html_content': '''
-                    <html>
-                    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                            <h1 style="color: #e74c3c;">Password Reset Request</h1>
-                            <p>Hi {{first_name}},</p>
-                            <p>You requested to reset your password for your {{company_name}} account.</p>
-                            <p style="margin: 30px 0;">
-                                <a href="{{reset_link}}" style="background-color: #3498db; color: white; padding: 12px 25px; text-decoration: none; border-radius: 5px; display: inline-block;">Reset Password</a>
-                            </p>
-                            <p>This link will expire in 24 hours. If you didn't request this, please ignore this email.</p>
-                            <p>Best regards,<br>The {{company_name}} Team</p>
-                        </div>
-                    </body>
-                    </html>
-                    ''',
-                    'text_content': '''Password Reset Request
-
-Hi {{first_name}},
-
-You requested to reset your password for your {{company_name}} account.
-
-Reset your password: {{reset_link}}
-
-This link will expire in 24 hours. If you didn't request this, please ignore this email.
-
-Best regards,
-The {{company_name}} Team''',
-                    'category': 'Authentication',
-                    'description': 'Password reset email template'
-                },
-                {
-                    'template_id': 'invoice-notification',
-                    'name': 'Invoice Notification',
-                    'subject': 'Invoice #{{invoice_number}} from {{company_name}}',
-                    'html_content': '''
-                    <html>
-                    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                            <h1 style="color: #27ae60;">Invoice #{{invoice_number}}</h1>
-                            <p>Hi {{customer_name}},</p>
-                            <p>Thank you for your business! Your invoice is ready.</p>
-                            <div style="background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0;">
-                                <p><strong>Invoice Number:</strong> {{invoice_number}}</p>
-                                <p><strong>Amount:</strong> {{amount}}</p>
-                                <p><strong>Due Date:</strong> {{due_date}}</p>
-                            </div>
-                            <p style="margin: 30px 0;">
-                                <a href="{{invoice_link}}" style="background-color: #27ae60; color: white; padding: 12px 25px; text-decoration: none; border-radius: 5px; display: inline-block;">View Invoice</a>
-                            </p>
-                            <p>Best regards,<br>The {{company_name}} Team</p>
-                        </div>
-                    </body>
-                    </html>
-                    ''',
-                    'text_content': '''Invoice #{{invoice_number}}
-
-Hi {{customer_name}},
-
-Thank you for your business! Your invoice is ready.
-
-Invoice Number: {{invoice_number}}
-Amount: {{amount}}
-Due Date: {{due_date}}
-
-View your invoice: {{invoice_link}}
-
-Best regards,
-The {{company_name}} Team''',
-                    'category': 'Business',
-                    'description': 'Invoice notification email template'
-                }
-            ]
-            
-            for template in system_templates:
-                variables = EmailService.extract_variables(template['html_content'])
-                variables.extend(EmailService.extract_variables(template['text_content']))
-                variables.extend(EmailService.extract_variables(template['subject']))
-                variables = list(set(variables))
-                
-                cursor.execute("""
-                    INSERT INTO email_templates 
-                    (template_id, name, subject, html_content, text_content, 
+            with db_manager.get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO email_templates
+                    (template_id, name, subject, html_content, text_content,
                      variables, category, description, is_system_template)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    template['template_id'], template['name'], template['subject'],
-                    template['html_content'], template['text_content'],
-                    json.dumps(variables), template['category'], 
-                    template['description'], True
-                ))
-            
-            conn.commit()
+                """, _SYSTEM_TEMPLATE_ROWS)
+                conn.commit()
+
+            _invalidate_template_cache()
             logger.info("System templates created successfully")
             
         except Exception as e:
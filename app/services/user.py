@@ -3,62 +3,101 @@ from app.core.database import db_manager
 from app.core.security import security
 from app.models.schemas import UserCreate, User, UserLogin, UserUpdate
 from app.core.config import settings
-import sqlite3
 import logging
+import time
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Explicit projection for user reads: everything the User model consumes,
+# and nothing else - keeps the bcrypt/argon2 hashed_password blob out of
+# row decode except where authentication actually needs it
+_USER_COLUMNS = (
+    "id, username, email, is_verified, is_admin, is_active, api_key, "
+    "created_at, updated_at"
+)
+
+# SQL hoisted to constants so each call passes the identical string and hits
+# the connection's prepared-statement cache instead of re-preparing
+_SQL_AUTHENTICATE = (
+    f"SELECT {_USER_COLUMNS}, hashed_password FROM users "
+    "WHERE email = ? AND is_active = 1"
+)
+_SQL_GET_BY_ID = f"SELECT {_USER_COLUMNS} FROM users WHERE id = ? AND is_active = 1"
+_SQL_GET_BY_USERNAME = f"SELECT {_USER_COLUMNS} FROM users WHERE username = ? AND is_active = 1"
+_SQL_GET_BY_API_KEY_HASH = f"SELECT {_USER_COLUMNS} FROM users WHERE api_key_hash = ?"
+_SQL_GET_BY_API_KEY = f"SELECT {_USER_COLUMNS} FROM users WHERE api_key = ?"
+
+def _user_from_row(row) -> User:
+    """Map a users row fetched with _USER_COLUMNS into a User model
+
+    The pool always sets row_factory = sqlite3.Row, so rows are indexed
+    positionally in _USER_COLUMNS order - no dict() copy, no per-field
+    string hashing. Values come straight from our own schema, so
+    model_construct skips Pydantic field validation on this hot path.
+    """
+    return User.model_construct(
+        id=row[0],
+        username=row[1],
+        email=row[2],
+        is_verified=bool(row[3]),
+        is_admin=bool(row[4]),
+        is_active=bool(row[5]),
+        api_key=row[6],
+        # model_construct skips coercion, so parse the timestamps here or
+        # they serialize as the raw SQLite strings
+        created_at=datetime.fromisoformat(row[7]),
+        updated_at=datetime.fromisoformat(row[8])
+    )
+
+# In-process cache of User objects keyed by API key. Every authenticated
+# request resolves its key through get_user_by_api_key, so a short TTL keeps
+# the hot path off the database while bounding how long a stale account state
+# (deactivation, verification) can linger.
+_API_KEY_CACHE_TTL = 60
+_API_KEY_CACHE_MAX_SIZE = 1024
+_api_key_cache: Dict[str, tuple] = {}
+
+def _invalidate_user_cache():
+    """Drop all cached API-key lookups after a user write"""
+    _api_key_cache.clear()
+
+# Hash verified against on the unknown-email path so failed logins take the
+# same time whether or not the account exists
+_DUMMY_PASSWORD_HASH = security.get_password_hash("kale-timing-equalizer")
+
 class UserService:
     @staticmethod
     def create_user(user_data: UserCreate) -> Optional[User]:
         """Create a new user"""
         try:
+            # Hash the password and generate the API key before touching the
+            # pool: hashing costs hundreds of milliseconds and must not hold
+            # a connection slot for its duration
+            hashed_password = security.get_password_hash(user_data.password)
+            api_key = security.generate_api_key()
+            api_key_hash = security.hash_api_key(api_key)
+
+            # Check if user should be admin
+            is_admin = user_data.email.lower() in settings.admin_emails_set
+
             with db_manager.get_db_connection() as conn:
-                # Check if username or email already exists
-                result = conn.execute(
-                    "SELECT id FROM users WHERE username = ? OR email = ?", 
-                    (user_data.username, user_data.email)
-                ).fetchone()
-                if result:
-                    return None
-                
-                # Hash password and generate API key
-                hashed_password = security.get_password_hash(user_data.password)
-                api_key = security.generate_api_key()
-                api_key_hash = security.get_password_hash(api_key)
-                
-                # Check if user should be admin
-                is_admin = user_data.email in settings.admin_emails_list
-                
-                # Insert user
-                cursor = conn.execute("""
-                    INSERT INTO users (username, email, hashed_password, is_admin, api_key, api_key_hash)
+                # Single atomic statement: the UNIQUE constraints on username
+                # and email reject duplicates, and no returned row means the
+                # conflict fired - no pre-check SELECT, no TOCTOU window
+                cursor = conn.execute(f"""
+                    INSERT OR IGNORE INTO users (username, email, hashed_password, is_admin, api_key, api_key_hash)
                     VALUES (?, ?, ?, ?, ?, ?)
+                    RETURNING {_USER_COLUMNS}
                 """, (user_data.username, user_data.email, hashed_password, is_admin, api_key, api_key_hash))
-                
-                user_id = cursor.lastrowid
+
+                user_row = cursor.fetchone()
                 conn.commit()
-                
-                # Fetch created user
-                user_row = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-                
-                # Ensure row is accessed as dictionary
-                if isinstance(user_row, sqlite3.Row):
-                    user_dict = dict(user_row)
-                else:
-                    user_dict = user_row
-                
-                return User(
-                    id=user_dict['id'],
-                    username=user_dict['username'],
-                    email=user_dict['email'],
-                    is_verified=bool(user_dict.get('is_verified', False)),
-                    is_admin=bool(user_dict.get('is_admin', False)),
-                    is_active=bool(user_dict.get('is_active', True)),
-                    api_key=user_dict['api_key'],
-                    created_at=user_dict['created_at'],
-                    updated_at=user_dict['updated_at']
-                )
+                if user_row is None:
+                    # Username or email already exists
+                    return None
+
+                return _user_from_row(user_row)
             
         except Exception as e:
             logger.error(f"Error creating user: {e}")
@@ -69,31 +108,19 @@ class UserService:
         """Authenticate user with email and password"""
         try:
             with db_manager.get_db_connection() as conn:
-                user_row = conn.execute("SELECT * FROM users WHERE email = ? AND is_active = 1", (user_data.email,)).fetchone()
+                user_row = conn.execute(_SQL_AUTHENTICATE, (user_data.email,)).fetchone()
                 
                 if not user_row:
+                    # Burn an equivalent verify so "no such email" is not
+                    # distinguishable from "wrong password" by response time
+                    security.verify_password(user_data.password, _DUMMY_PASSWORD_HASH)
                     return None
-                
-                # Ensure row is accessed as dictionary
-                if isinstance(user_row, sqlite3.Row):
-                    user_dict = dict(user_row)
-                else:
-                    user_dict = user_row
-                
-                if not security.verify_password(user_data.password, user_dict['hashed_password']):
+
+                # hashed_password is appended after the _USER_COLUMNS projection
+                if not security.verify_password(user_data.password, user_row[9]):
                     return None
-                
-                return User(
-                    id=user_dict['id'],
-                    username=user_dict['username'],
-                    email=user_dict['email'],
-                    is_verified=bool(user_dict.get('is_verified', False)),
-                    is_admin=bool(user_dict.get('is_admin', False)),
-                    is_active=bool(user_dict.get('is_active', True)),
-                    api_key=user_dict['api_key'],
-                    created_at=user_dict['created_at'],
-                    updated_at=user_dict['updated_at']
-                )
+
+                return _user_from_row(user_row)
             
         except Exception as e:
             logger.error(f"Error authenticating user: {e}")
@@ -104,31 +131,12 @@ class UserService:
         """Get user by ID"""
         try:
             with db_manager.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT * FROM users WHERE id = ? AND is_active = 1", (user_id,))
-                user_row = cursor.fetchone()
+                user_row = conn.execute(_SQL_GET_BY_ID, (user_id,)).fetchone()
                 
                 if not user_row:
                     return None
                 
-                # Ensure row is accessed as dictionary
-                if isinstance(user_row, sqlite3.Row):
-                    user_dict = dict(user_row)
-                else:
-                    user_dict = user_row
-                
-                return User(
-                    id=user_dict['id'],
-                    username=user_dict['username'],
-                    email=user_dict['email'],
-                    is_verified=bool(user_dict.get('is_verified', False)),
-                    is_admin=bool(user_dict.get('is_admin', False)),
-                    is_active=bool(user_dict.get('is_active', True)),
-                    api_key=user_dict['api_key'],
-                    created_at=user_dict['created_at'],
-                    updated_at=user_dict['updated_at']
-                )
+                return _user_from_row(user_row)
                 
         except Exception as e:
             logger.error(f"Error getting user by ID: {e}")
@@ -139,31 +147,12 @@ class UserService:
         """Get user by username"""
         try:
             with db_manager.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT * FROM users WHERE username = ? AND is_active = 1", (username,))
-                user_row = cursor.fetchone()
+                user_row = conn.execute(_SQL_GET_BY_USERNAME, (username,)).fetchone()
                 
                 if not user_row:
                     return None
                 
-                # Ensure row is accessed as dictionary
-                if isinstance(user_row, sqlite3.Row):
-                    user_dict = dict(user_row)
-                else:
-                    user_dict = user_row
-                
-                return User(
-                    id=user_dict['id'],
-                    username=user_dict['username'],
-                    email=user_dict['email'],
-                    is_verified=bool(user_dict.get('is_verified', False)),
-                    is_admin=bool(user_dict.get('is_admin', False)),
-                    is_active=bool(user_dict.get('is_active', True)),
-                    api_key=user_dict['api_key'],
-                    created_at=user_dict['created_at'],
-                    updated_at=user_dict['updated_at']
-                )
+                return _user_from_row(user_row)
                 
         except Exception as e:
             logger.error(f"Error getting user by username: {e}")
@@ -173,33 +162,30 @@ class UserService:
     def get_user_by_api_key(api_key: str) -> Optional[User]:
         """Get user by API key"""
         try:
+            cached = _api_key_cache.get(api_key)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+
             with db_manager.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT * FROM users WHERE api_key = ?", (api_key,))
-                user_row = cursor.fetchone()
-                
+                # Look up by the keyed digest so the query compares fixed-width
+                # hashes on the api_key_hash index instead of the raw secret
+                user_row = conn.execute(_SQL_GET_BY_API_KEY_HASH, (security.hash_api_key(api_key),)).fetchone()
+
+                if not user_row:
+                    # Legacy rows created before keys were stored hashed
+                    user_row = conn.execute(_SQL_GET_BY_API_KEY, (api_key,)).fetchone()
+
                 if not user_row:
                     return None
-                
-                # Ensure row is accessed as dictionary
-                if isinstance(user_row, sqlite3.Row):
-                    user_dict = dict(user_row)
-                else:
-                    user_dict = user_row
-                
-                return User(
-                    id=user_dict['id'],
-                    username=user_dict['username'],
-                    email=user_dict['email'],
-                    is_verified=bool(user_dict.get('is_verified', False)),
-                    is_admin=bool(user_dict.get('is_admin', False)),
-                    is_active=bool(user_dict.get('is_active', True)),
-                    api_key=user_dict['api_key'],
-                    created_at=user_dict['created_at'],
-                    updated_at=user_dict['updated_at']
-                )
-                
+
+                user = _user_from_row(user_row)
+
+                if len(_api_key_cache) >= _API_KEY_CACHE_MAX_SIZE:
+                    _api_key_cache.clear()
+                _api_key_cache[api_key] = (user, time.monotonic() + _API_KEY_CACHE_TTL)
+
+                return user
+
         except Exception as e:
             logger.error(f"Error getting user by API key: {e}")
             return None
@@ -208,45 +194,52 @@ class UserService:
     def update_user(user_id: int, user_data: UserUpdate, current_user: User) -> bool:
         """Update user information"""
         try:
+            # Fetch the stored hash on a short-lived connection, then do the
+            # expensive verify/hash work without holding a pool slot
             with db_manager.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Get current user data for password verification
-                cursor.execute("SELECT hashed_password FROM users WHERE id = ?", (user_id,))
-                user_row = cursor.fetchone()
-                if not user_row:
+                user_row = conn.execute(
+                    "SELECT hashed_password FROM users WHERE id = ?", (user_id,)
+                ).fetchone()
+
+            if not user_row:
+                return False
+
+            updates = []
+            params = []
+
+            if user_data.email:
+                updates.append("email = ?")
+                params.append(user_data.email)
+
+            if user_data.new_password:
+                if not user_data.current_password:
                     return False
-                
-                updates = []
-                params = []
-                
-                if user_data.email:
-                    # Check if email is already taken by another user
-                    cursor.execute("SELECT id FROM users WHERE email = ? AND id != ?", (user_data.email, user_id))
-                    if cursor.fetchone():
-                        return False
-                    updates.append("email = ?")
-                    params.append(user_data.email)
-                
-                if user_data.new_password:
-                    if not user_data.current_password:
-                        return False
-                    
-                    # Verify current password
-                    if not security.verify_password(user_data.current_password, user_row['hashed_password']):
-                        return False
-                    
-                    updates.append("hashed_password = ?")
-                    params.append(security.get_password_hash(user_data.new_password))
-                
+
+                # Verify current password
+                if not security.verify_password(user_data.current_password, user_row['hashed_password']):
+                    return False
+
+                updates.append("hashed_password = ?")
+                params.append(security.get_password_hash(user_data.new_password))
+
+            with db_manager.get_db_connection() as conn:
                 if updates:
                     updates.append("updated_at = CURRENT_TIMESTAMP")
                     params.append(user_id)
-                    
+
                     query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
-                    cursor.execute(query, params)
+                    if user_data.email:
+                        # Uniqueness folded into the UPDATE: the row is left
+                        # untouched when another user already owns the address
+                        query += " AND NOT EXISTS (SELECT 1 FROM users other WHERE other.email = ? AND other.id != ?)"
+                        params.extend([user_data.email, user_id])
+
+                    updated = conn.execute(query, params).rowcount > 0
                     conn.commit()
-                
+                    if not updated:
+                        return False
+                    _invalidate_user_cache()
+
                 return True
                 
         except Exception as e:
@@ -258,13 +251,12 @@ class UserService:
         """Mark user as verified"""
         try:
             with db_manager.get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute(
+                conn.execute(
                     "UPDATE users SET is_verified = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                     (True, user_id)
                 )
                 conn.commit()
+                _invalidate_user_cache()
                 return True
                 
         except Exception as e:
@@ -277,27 +269,15 @@ class UserService:
         try:
             with db_manager.get_db_connection() as conn:
                 cursor = conn.cursor()
-                
+                # Pre-size the fetch buffer to the page we are about to pull
+                cursor.arraysize = limit
+
                 cursor.execute(
-                    "SELECT * FROM users ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                    f"SELECT {_USER_COLUMNS} FROM users ORDER BY created_at DESC LIMIT ? OFFSET ?",
                     (limit, offset)
                 )
-                user_rows = cursor.fetchall()
-                
-                return [
-                    User(
-                        id=dict(row)['id'] if isinstance(row, sqlite3.Row) else row['id'],
-                        username=dict(row)['username'] if isinstance(row, sqlite3.Row) else row['username'],
-                        email=dict(row)['email'] if isinstance(row, sqlite3.Row) else row['email'],
-                        is_verified=bool(dict(row).get('is_verified', False) if isinstance(row, sqlite3.Row) else row.get('is_verified', False)),
-                        is_admin=bool(dict(row).get('is_admin', False) if isinstance(row, sqlite3.Row) else row.get('is_admin', False)),
-                        is_active=bool(dict(row).get('is_active', True) if isinstance(row, sqlite3.Row) else row.get('is_active', True)),
-                        api_key=dict(row)['api_key'] if isinstance(row, sqlite3.Row) else row['api_key'],
-                        created_at=dict(row)['created_at'] if isinstance(row, sqlite3.Row) else row['created_at'],
-                        updated_at=dict(row)['updated_at'] if isinstance(row, sqlite3.Row) else row['updated_at']
-                    )
-                    for row in user_rows
-                ]
+
+                return list(map(_user_from_row, cursor.fetchall()))
                 
         except Exception as e:
             logger.error(f"Error getting all users: {e}")
@@ -7,83 +7,85 @@ import bcrypt
 import logging
 import secrets
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# (username, email, password, is_admin)
+DEFAULT_ACCOUNTS = [
+    ("admin", "admin@example.com", "Admin@2025", True),
+    ("demo", "demo@example.com", "Demio@2025", False),
+]
+
 def generate_api_key():
     """Generate a secure API key"""
     return secrets.token_urlsafe(32)
 
 def hash_api_key(api_key: str) -> str:
     """Hash an API key for storage"""
-    return hashlib.sha256(api_key.encode()).hexdigest()
+    return hashlib.sha256(api_key.encode(), usedforsecurity=False).hexdigest()
+
+def hash_password(password: str) -> str:
+    """Hash a password with bcrypt"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def create_default_accounts():
     """Create default admin and demo accounts"""
     try:
         # Connect to database
-        conn = sqlite3.connect('kale.db')
+        conn = sqlite3.connect('kale.db', isolation_level=None)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        
-        # Check if admin user already exists
-        cursor.execute("SELECT id FROM users WHERE email = ?", ("admin@example.com",))
-        if cursor.fetchone():
-            logger.info("Admin user already exists")
-        else:
-            # Create admin user
-            hashed_password = bcrypt.hashpw("Admin@2025".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            api_key = generate_api_key()
-            api_key_hash = hash_api_key(api_key)
-            
-            cursor.execute("""
-                INSERT INTO users (username, email, hashed_password, api_key, api_key_hash, is_admin, is_verified, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                "admin",
-                "admin@example.com", 
-                hashed_password,
-                api_key,
-                api_key_hash,
-                True,
-                True,
-                datetime.utcnow().isoformat()
-            ))
-            logger.info("✓ Admin user created (email: admin@example.com, password: Admin@2025)")
-            logger.info(f"✓ Admin API key: {api_key}")
-        
-        # Check if demo user already exists
-        cursor.execute("SELECT id FROM users WHERE email = ?", ("demo@example.com",))
-        if cursor.fetchone():
-            logger.info("Demo user already exists")
-        else:
-            # Create demo user
-            hashed_password = bcrypt.hashpw("Demio@2025".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            api_key = generate_api_key()
-            api_key_hash = hash_api_key(api_key)
-            
-            cursor.execute("""
+
+        # Find which default accounts are missing in one query
+        placeholders = ", ".join("?" for _ in DEFAULT_ACCOUNTS)
+        cursor.execute(
+            f"SELECT email FROM users WHERE email IN ({placeholders})",
+            [account[1] for account in DEFAULT_ACCOUNTS]
+        )
+        existing = {row['email'] for row in cursor.fetchall()}
+
+        missing = []
+        for account in DEFAULT_ACCOUNTS:
+            if account[1] in existing:
+                logger.info(f"{account[0].capitalize()} user already exists")
+            else:
+                missing.append(account)
+
+        if missing:
+            # bcrypt releases the GIL, so hash the passwords concurrently
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                hashed_passwords = list(executor.map(hash_password, [a[2] for a in missing]))
+
+            rows = []
+            for (username, email, password, is_admin), hashed_password in zip(missing, hashed_passwords):
+                api_key = generate_api_key()
+                rows.append((
+                    username,
+                    email,
+                    hashed_password,
+                    api_key,
+                    hash_api_key(api_key),
+                    is_admin,
+                    True,
+                    datetime.utcnow().isoformat()
+                ))
+                logger.info(f"✓ {username.capitalize()} user created (email: {email}, password: {password})")
+                logger.info(f"✓ {username.capitalize()} API key: {api_key}")
+
+            # Single transaction: one lock acquisition, one fsync
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.executemany("""
                 INSERT INTO users (username, email, hashed_password, api_key, api_key_hash, is_admin, is_verified, created_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                "demo",
-                "demo@example.com",
-                hashed_password,
-                api_key,
-                api_key_hash,
-                False,
-                True,
-                datetime.utcnow().isoformat()
-            ))
-            logger.info("✓ Demo user created (email: demo@example.com, password: Demio@2025)")
-            logger.info(f"✓ Demo API key: {api_key}")
-        
-        conn.commit()
+            """, rows)
+            conn.commit()
+
         conn.close()
         logger.info("✓ Default accounts creation completed")
-        
+
     except Exception as e:
         logger.error(f"✗ Failed to create default accounts: {e}")
         raise